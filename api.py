@@ -1,13 +1,16 @@
 """
 FastAPI application for Sarthi AI
 """
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import asyncio
+import orjson
+import time
 from pathlib import Path
 from config import settings
 from utils.logger import get_logger
@@ -15,11 +18,69 @@ from main import pipeline
 
 logger = get_logger(__name__)
 
+# Background tasks owned by the lifespan
+_init_task: Optional[asyncio.Task] = None
+_status_task: Optional[asyncio.Task] = None
+
+# Status snapshot refreshed in the background so polling stays cheap
+_latest_status: Optional[Dict[str, Any]] = None
+
+async def _run_initialization():
+    """Run system initialization off the event loop"""
+    try:
+        result = await asyncio.to_thread(pipeline.initialize_system)
+        logger.info(f"System initialization result: {result}")
+    except Exception as e:
+        logger.error(f"Error during startup initialization: {e}")
+
+async def _status_refresher():
+    """Periodically rebuild the system-status snapshot"""
+    global _latest_status
+    while True:
+        try:
+            _latest_status = await asyncio.to_thread(pipeline.get_system_status)
+        except Exception as e:
+            logger.error(f"Error refreshing status snapshot: {e}")
+        await asyncio.sleep(5)
+
+def _initialization_state() -> str:
+    """Describe the current state of the background initialization task"""
+    if _init_task is None:
+        return "not_started"
+    if not _init_task.done():
+        return "running"
+    if _init_task.cancelled() or _init_task.exception() is not None:
+        return "error"
+    return "complete"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background initialization and the status refresher"""
+    global _init_task, _status_task
+
+    logger.info("Starting Sarthi AI API server...")
+    settings.ensure_dirs()
+
+    # Let short-lived coroutines complete without a scheduler round-trip (Py3.12+)
+    if hasattr(asyncio, "eager_task_factory"):
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+
+    _init_task = asyncio.create_task(_run_initialization())
+    _status_task = asyncio.create_task(_status_refresher())
+    logger.info("API server started successfully")
+
+    yield
+
+    for task in (_init_task, _status_task):
+        if task is not None and not task.done():
+            task.cancel()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Sarthi AI - Rajasthan Procurement Assistant",
     description="AI-powered chatbot for Rajasthan Transparency in Public Procurement Act, 2012",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -52,32 +113,12 @@ class DocumentInfo(BaseModel):
 
 class SystemStatus(BaseModel):
     status: str
+    initialization: str
     vector_store: Dict[str, Any]
     graph: Dict[str, Any]
     memory: Dict[str, Any]
     documents_available: int
 
-# Startup event
-@app.on_event("startup")
-async def startup_event():
-    """Initialize the system on startup"""
-    logger.info("Starting Sarthi AI API server...")
-    
-    # Run initialization in background
-    def init_system():
-        try:
-            result = pipeline.initialize_system()
-            logger.info(f"System initialization result: {result}")
-        except Exception as e:
-            logger.error(f"Error during startup initialization: {e}")
-    
-    # Run in thread pool to avoid blocking
-    import threading
-    init_thread = threading.Thread(target=init_system)
-    init_thread.start()
-    
-    logger.info("API server started successfully")
-
 @app.get("/")
 async def read_root():
     """Serve the frontend"""
@@ -106,9 +147,13 @@ async def health_check():
 async def get_status():
     """Get comprehensive system status"""
     try:
-        status_data = pipeline.get_system_status()
+        # Serve the background-refreshed snapshot; fall back to a live call
+        status_data = _latest_status
+        if status_data is None:
+            status_data = await asyncio.to_thread(pipeline.get_system_status)
         return SystemStatus(
             status="operational",
+            initialization=_initialization_state(),
             **status_data
         )
     except Exception as e:
@@ -121,8 +166,8 @@ async def get_documents():
     try:
         from processing.document_loader import document_loader
         
-        docs_info = document_loader.get_document_info()
-        processed_docs = pipeline.vector_store.get_processed_documents()
+        docs_info = await asyncio.to_thread(document_loader.get_document_info)
+        processed_docs = await asyncio.to_thread(pipeline.vector_store.get_processed_documents)
         
         result = []
         for doc_info in docs_info:
@@ -150,10 +195,9 @@ async def query_endpoint(request: QueryRequest):
         
         logger.info(f"Received query: {request.query[:100]}...")
         
-        result = pipeline.query(
+        result = await pipeline.query_async(
             user_query=request.query,
-            use_graph_expansion=request.use_graph_expansion,
-            stream=False
+            use_graph_expansion=request.use_graph_expansion
         )
         
         return QueryResponse(**result)
@@ -174,22 +218,38 @@ async def query_stream_endpoint(request: QueryRequest):
         logger.info(f"Received streaming query: {request.query[:100]}...")
         
         async def event_generator():
-            """Generate SSE events"""
+            """Generate SSE events, coalescing small chunks into larger frames"""
+            buffer = []
+            buffer_len = 0
+            last_flush = time.monotonic()
+
             try:
                 # Get the streaming generator from pipeline
-                for chunk in pipeline.query(
+                async for chunk in pipeline.query_stream_async(
                     user_query=request.query,
-                    use_graph_expansion=request.use_graph_expansion,
-                    stream=True
+                    use_graph_expansion=request.use_graph_expansion
                 ):
-                    import json
-                    # Format as SSE
-                    yield f"data: {json.dumps(chunk)}\n\n"
-                    await asyncio.sleep(0.01)  # Small delay for smooth streaming
-                
+                    if chunk.get("type") == "chunk":
+                        buffer.append(chunk["content"])
+                        buffer_len += len(chunk["content"])
+                        now = time.monotonic()
+
+                        # Flush on size or elapsed time, not per token
+                        if buffer_len >= 4096 or now - last_flush >= 0.025:
+                            yield b"data: " + orjson.dumps({"type": "chunk", "content": "".join(buffer)}) + b"\n\n"
+                            buffer = []
+                            buffer_len = 0
+                            last_flush = now
+                    else:
+                        if buffer:
+                            yield b"data: " + orjson.dumps({"type": "chunk", "content": "".join(buffer)}) + b"\n\n"
+                            buffer = []
+                            buffer_len = 0
+                        yield b"data: " + orjson.dumps(chunk) + b"\n\n"
+
             except Exception as e:
                 logger.error(f"Error in streaming: {e}")
-                yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+                yield b"data: " + orjson.dumps({"type": "error", "message": str(e)}) + b"\n\n"
         
         return StreamingResponse(
             event_generator(),
@@ -210,7 +270,7 @@ async def query_stream_endpoint(request: QueryRequest):
 async def get_conversations():
     """Get conversation history"""
     try:
-        conversations = pipeline.memory.get_all_conversations()
+        conversations = await asyncio.to_thread(pipeline.memory.get_all_conversations)
         return {
             "total": len(conversations),
             "conversations": conversations[-50:]  # Last 50 conversations
@@ -223,7 +283,7 @@ async def get_conversations():
 async def clear_conversations():
     """Clear conversation history"""
     try:
-        pipeline.memory.clear_history()
+        await asyncio.to_thread(pipeline.memory.clear_history)
         return {
             "status": "success",
             "message": "Conversation history cleared"
@@ -233,24 +293,23 @@ async def clear_conversations():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/initialize")
-async def reinitialize_system(background_tasks: BackgroundTasks):
+async def reinitialize_system():
     """Reinitialize the system and process new documents"""
+    global _init_task
     try:
-        # Run initialization in background
-        def init_task():
-            try:
-                result = pipeline.initialize_system()
-                logger.info(f"Reinitialization complete: {result}")
-            except Exception as e:
-                logger.error(f"Error during reinitialization: {e}")
-        
-        background_tasks.add_task(init_task)
-        
+        if _init_task is not None and not _init_task.done():
+            return {
+                "status": "already_running",
+                "message": "System initialization is already in progress"
+            }
+
+        _init_task = asyncio.create_task(_run_initialization())
+
         return {
             "status": "initiated",
             "message": "System reinitialization started in background"
         }
-        
+
     except Exception as e:
         logger.error(f"Error initiating reinitialization: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -259,7 +318,7 @@ async def reinitialize_system(background_tasks: BackgroundTasks):
 async def get_graph_stats():
     """Get graph statistics"""
     try:
-        stats = pipeline.graph_rag.get_graph_stats()
+        stats = await asyncio.to_thread(pipeline.graph_rag.get_graph_stats)
         return stats
     except Exception as e:
         logger.error(f"Error getting graph stats: {e}")
@@ -269,7 +328,7 @@ async def get_graph_stats():
 async def get_document_structure(doc_id: str):
     """Get hierarchical structure of a document"""
     try:
-        structure = pipeline.graph_rag.get_document_structure(doc_id)
+        structure = await asyncio.to_thread(pipeline.graph_rag.get_document_structure, doc_id)
         if not structure:
             raise HTTPException(status_code=404, detail="Document not found")
         return structure
@@ -283,7 +342,7 @@ async def get_document_structure(doc_id: str):
 async def clear_all_data():
     """Clear all system data (use with caution!)"""
     try:
-        pipeline.clear_all_data()
+        await asyncio.to_thread(pipeline.clear_all_data)
         return {
             "status": "success",
             "message": "All system data cleared. Please reinitialize."
@@ -299,7 +358,7 @@ async def search_conversations(q: str, limit: int = 5):
         if not q.strip():
             raise HTTPException(status_code=400, detail="Query cannot be empty")
         
-        results = pipeline.memory.search_conversations(q, limit=limit)
+        results = await asyncio.to_thread(pipeline.memory.search_conversations, q, limit=limit)
         return {
             "query": q,
             "results": results,
@@ -322,6 +381,8 @@ if __name__ == "__main__":
         "api:app",
         host=settings.API_HOST,
         port=settings.API_PORT,
-        reload=True,
+        workers=settings.API_WORKERS,
+        loop="uvloop",
+        http="httptools",
         log_level="info"
     )
\ No newline at end of file
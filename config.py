@@ -1,7 +1,6 @@
 """
 Configuration module for Sarthi AI Chatbot
 """
-import os
 from pathlib import Path
 from pydantic_settings import BaseSettings
 from typing import Optional
@@ -49,6 +48,7 @@ class Settings(BaseSettings):
     MAX_TOKENS: int = 2048
     TEMPERATURE: float = 0.1
     TOP_P: float = 0.9
+    LLM_KEEP_ALIVE: str = "1h"
     
     # Memory Configuration
     MAX_CONVERSATION_HISTORY: int = 10
@@ -57,6 +57,7 @@ class Settings(BaseSettings):
     # Processing
     BATCH_SIZE: int = 16
     MAX_WORKERS: int = 4
+    PDF_BACKEND: str = "pymupdf"  # "pymupdf" (fast, C core) or "pypdf"
     
     # Cache
     CACHE_TTL: int = 86400  # 24 hours
@@ -64,16 +65,20 @@ class Settings(BaseSettings):
     # API
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
+    # Keep a single worker by default: every worker process runs its own
+    # lifespan ingest against the same data directory, and embedded Qdrant
+    # holds an exclusive lock on QDRANT_PATH. Raise only behind a Qdrant
+    # server with ingest handled out of band.
+    API_WORKERS: int = 1
     CORS_ORIGINS: list = ["*"]
     
     class Config:
         env_file = ".env"
         case_sensitive = True
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        # Create directories
-        for path in [self.DATA_DIR, self.QDRANT_PATH, self.GRAPH_PATH, 
+    def ensure_dirs(self):
+        """Create the data directories (called once at app startup)"""
+        for path in [self.DATA_DIR, self.QDRANT_PATH, self.GRAPH_PATH,
                      self.MEMORY_PATH, self.CACHE_PATH, self.DOCUMENTS_DIR]:
             path.mkdir(parents=True, exist_ok=True)
 
@@ -1,20 +1,39 @@
 """
 Main processing pipeline for Sarthi AI
 """
+import asyncio
+import pickle
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 from config import settings
+
+settings.ensure_dirs()
+
 from utils.logger import get_logger
-from processing.document_loader import document_loader, Document
+from processing.document_loader import document_loader
 from processing.chunking import chunker, Chunk
 from storage.vector_store import vector_store
 from models.graph_rag import graph_rag
 from storage.conversation_memory import conversation_memory
+from storage.semantic_cache import semantic_cache
+from storage.response_cache import response_cache, SmartRAGCache
 from models.llm import llm_model, SARTHI_SYSTEM_PROMPT
+from models.embeddings import embedding_model
 
 logger = get_logger(__name__)
 
+# Static prompt sections, built once so every query reuses the same prefix
+_CONVERSATION_HEADER = "=== Previous Conversation ==="
+_CONTEXT_HEADER = "=== Relevant Information from Documents ==="
+_QUESTION_HEADER = "=== User Question ==="
+_RESPONSE_HEADER = "=== Your Response ==="
+_RESPONSE_INSTRUCTION = (
+    "Based on the provided information and conversation history, "
+    "please answer the question accurately and concisely:"
+)
+
 class SarthiPipeline:
     """Main processing pipeline for Sarthi AI"""
     
@@ -23,6 +42,13 @@ class SarthiPipeline:
         self.graph_rag = graph_rag
         self.memory = conversation_memory
         self.llm = llm_model
+        self.semantic_cache = semantic_cache
+        self.response_cache = response_cache
+        # Graph nodes hold structure only; chunk text is resolved here
+        self.graph_rag.set_chunk_store(self.vector_store)
+        # Bind hot-path settings once instead of per-query pydantic lookups
+        self._top_k = settings.RETRIEVAL_TOP_K
+        self._rerank_k = settings.RERANK_TOP_K
         logger.info("Sarthi AI Pipeline initialized")
     
     def initialize_system(self) -> Dict[str, Any]:
@@ -41,33 +67,44 @@ class SarthiPipeline:
         }
         
         try:
-            # Get all documents
-            documents = document_loader.load_all_documents()
-            result["total_documents"] = len(documents)
-            
-            if not documents:
+            # Decide what needs processing from filenames alone, so already
+            # processed documents are never re-extracted
+            pdf_files = sorted(document_loader.documents_dir.glob("*.pdf"))
+            result["total_documents"] = len(pdf_files)
+
+            if not pdf_files:
                 logger.warning("No documents found in documents directory")
                 result["status"] = "warning"
                 result["message"] = "No documents found"
                 return result
-            
-            # Check which documents need processing
-            new_documents = []
-            for doc in documents:
-                if not self.vector_store.is_document_processed(doc.doc_id):
-                    new_documents.append(doc)
-                    logger.info(f"New document detected: {doc.doc_id}")
-            
-            if new_documents:
-                logger.info(f"Processing {len(new_documents)} new documents...")
-                
-                for doc in new_documents:
-                    success = self._process_document(doc)
-                    if success:
-                        result["new_documents_processed"] += 1
+
+            new_files = []
+            for pdf_file in pdf_files:
+                if not self.vector_store.is_document_processed(pdf_file.stem):
+                    new_files.append(pdf_file)
+                    logger.info(f"New document detected: {pdf_file.stem}")
+
+            if new_files:
+                logger.info(f"Processing {len(new_files)} new documents...")
+
+                # Documents are independent and I/O-bound - process them concurrently
+                with ThreadPoolExecutor(max_workers=settings.MAX_WORKERS) as executor:
+                    futures = {
+                        executor.submit(self._process_document, pdf_file): pdf_file
+                        for pdf_file in new_files
+                    }
+                    for future in as_completed(futures):
+                        if future.result():
+                            result["new_documents_processed"] += 1
             else:
                 logger.info("All documents already processed. Loading from cache...")
             
+            # New documents change what answers are correct - drop cached responses
+            if result["new_documents_processed"] > 0:
+                self.graph_rag.flush()
+                self.response_cache.clear()
+                self.semantic_cache.clear()
+
             # Get collection info
             collection_info = self.vector_store.get_collection_info()
             result["total_chunks"] = collection_info.get("points_count", 0)
@@ -90,37 +127,64 @@ class SarthiPipeline:
             result["error"] = str(e)
             return result
     
-    def _process_document(self, doc: Document) -> bool:
-        """Process a single document"""
+    def _process_document(self, pdf_file: Path) -> bool:
+        """Process a single document, streaming pages through the chunker"""
+        doc_id = pdf_file.stem
         try:
-            logger.info(f"Processing document: {doc.doc_id}")
+            logger.info(f"Processing document: {doc_id}")
             start_time = time.time()
-            
-            # Chunk the document
-            chunks = chunker.chunk_text(
-                text=doc.content,
-                metadata=doc.metadata,
-                doc_id=doc.doc_id
+
+            metadata = document_loader.get_pdf_metadata(pdf_file)
+            content_hash = document_loader.file_hash(pdf_file)
+            metadata["content_hash"] = content_hash
+
+            # Chunking is deterministic given the file bytes and chunker
+            # settings, so re-ingests of unchanged files reuse cached chunks
+            cache_file = settings.CACHE_PATH / (
+                f"{content_hash}_{chunker.chunk_size}_{chunker.chunk_overlap}.chunks.pkl"
             )
-            
+            chunks = None
+            if cache_file.exists():
+                try:
+                    with open(cache_file, 'rb') as f:
+                        chunks = pickle.load(f)
+                    logger.info(f"Loaded {len(chunks)} cached chunks for {doc_id}")
+                except Exception as e:
+                    logger.warning(f"Error reading chunk cache for {doc_id}: {e}")
+                    chunks = None
+
+            if chunks is None:
+                # Chunk page by page; the full document text is never joined
+                chunks = list(chunker.chunk_stream(
+                    document_loader.iter_pages(pdf_file),
+                    metadata=metadata,
+                    doc_id=doc_id
+                ))
+                if chunks:
+                    try:
+                        with open(cache_file, 'wb') as f:
+                            pickle.dump(chunks, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    except Exception as e:
+                        logger.warning(f"Error writing chunk cache for {doc_id}: {e}")
+
             if not chunks:
-                logger.warning(f"No chunks created for document {doc.doc_id}")
+                logger.warning(f"No chunks created for document {doc_id}")
                 return False
-            
+
             # Add to vector store
-            vector_success = self.vector_store.add_chunks(chunks, doc.doc_id)
-            
-            # Add to graph
+            vector_success = self.vector_store.add_chunks(chunks, doc_id)
+
+            # Add to graph; the bulk caller flushes once at the end
             if vector_success:
-                self.graph_rag.add_document(doc.doc_id, chunks, doc.metadata)
-            
+                self.graph_rag.add_document(doc_id, chunks, metadata, flush=False)
+
             elapsed = time.time() - start_time
-            logger.info(f"Document {doc.doc_id} processed successfully in {elapsed:.2f}s")
-            
+            logger.info(f"Document {doc_id} processed successfully in {elapsed:.2f}s")
+
             return vector_success
-            
+
         except Exception as e:
-            logger.error(f"Error processing document {doc.doc_id}: {e}")
+            logger.error(f"Error processing document {doc_id}: {e}")
             return False
     
     def query(
@@ -132,89 +196,203 @@ class SarthiPipeline:
         """Process a user query and generate response"""
         logger.info(f"Processing query: {user_query[:100]}...")
         start_time = time.time()
-        
+
         try:
+            # Exact repeats are answered straight from the response cache
+            cache_key = None
+            if not stream:
+                cache_key = SmartRAGCache.make_key(user_query, use_graph_expansion)
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            # Check the semantic cache for an equivalent recent query
+            query_vector = embedding_model.embed_query(user_query)
+            if not stream:
+                cached = self.semantic_cache.get(query_vector)
+                if cached is not None:
+                    return cached
+
             # Search vector store
-            search_results = self.vector_store.search(
-                query=user_query,
-                top_k=settings.RETRIEVAL_TOP_K
-            )
-            
+            search_results = self._vector_search(user_query, query_vector)
+
             if not search_results:
                 return self._generate_no_context_response(user_query)
-            
+
             # Expand context using graph if enabled
             if use_graph_expansion:
-                chunk_ids = [r["chunk_id"] for r in search_results[:3]]
-                related_chunks = self.graph_rag.get_related_chunks(chunk_ids, max_chunks=3)
-                
-                if related_chunks:
-                    logger.info(f"Expanded context with {len(related_chunks)} related chunks")
-                    # Add related chunks to results (simplified - in production, fetch from store)
-            
+                self._expand_with_graph(search_results)
+
             # Get conversation context
             conversation_context = self.memory.get_recent_context(n=3)
-            
-            # Build context for LLM
-            context_parts = []
-            for i, result in enumerate(search_results[:settings.RERANK_TOP_K], 1):
-                context_parts.append(
-                    f"[Source {i}] (from {result['metadata'].get('filename', 'unknown')}, "
-                    f"page {result['metadata'].get('page_number', 'N/A')})\n"
-                    f"{result['text']}\n"
-                )
-            
-            context = "\n".join(context_parts)
-            
-            # Build prompt
-            prompt = self._build_prompt(user_query, context, conversation_context)
-            
+
             # Generate response
             if stream:
+                context = self._build_context(search_results)
+                prompt = self._build_prompt(user_query, context, conversation_context)
                 return self._generate_streaming_response(
                     prompt=prompt,
                     user_query=user_query,
                     search_results=search_results,
                     start_time=start_time
                 )
-            else:
-                response = self.llm.generate(
-                    prompt=prompt,
-                    system_prompt=SARTHI_SYSTEM_PROMPT,
-                    stream=False
-                )
-                
-                # Add to memory
-                self.memory.add_interaction(
-                    user_message=user_query,
-                    assistant_response=response,
-                    context_chunks=search_results
+
+            return self._complete_query(
+                user_query=user_query,
+                query_vector=query_vector,
+                search_results=search_results,
+                conversation_context=conversation_context,
+                start_time=start_time,
+                cache_key=cache_key
+            )
+
+        except Exception as e:
+            logger.error(f"Error processing query: {e}")
+            return self._generate_error_response(e)
+
+    async def query_async(
+        self,
+        user_query: str,
+        use_graph_expansion: bool = True
+    ) -> Dict[str, Any]:
+        """Process a user query with the independent retrieval steps overlapped"""
+        logger.info(f"Processing query: {user_query[:100]}...")
+        start_time = time.time()
+
+        try:
+            # Exact repeats are answered straight from the response cache
+            cache_key = SmartRAGCache.make_key(user_query, use_graph_expansion)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+            query_vector = await asyncio.to_thread(embedding_model.embed_query, user_query)
+            cached = self.semantic_cache.get(query_vector)
+            if cached is not None:
+                return cached
+
+            # Vector search and memory fetch are independent - run them concurrently
+            memory_task = asyncio.create_task(
+                asyncio.to_thread(self.memory.get_recent_context, n=3)
+            )
+            search_results = await asyncio.to_thread(
+                self._vector_search, user_query, query_vector
+            )
+
+            if not search_results:
+                await memory_task
+                return self._generate_no_context_response(user_query)
+
+            # Graph expansion needs the top hits, but can overlap the memory fetch
+            if use_graph_expansion:
+                _, conversation_context = await asyncio.gather(
+                    asyncio.to_thread(self._expand_with_graph, search_results),
+                    memory_task
                 )
-                
-                elapsed = time.time() - start_time
-                
-                return {
-                    "response": response,
-                    "sources": [
-                        {
-                            "filename": r["metadata"].get("filename", "unknown"),
-                            "page": r["metadata"].get("page_number"),
-                            "chunk_id": r["chunk_id"],
-                            "score": round(r["score"], 3)
-                        }
-                        for r in search_results[:5]
-                    ],
-                    "processing_time": round(elapsed, 2),
-                    "context_used": len(search_results)
-                }
-        
+            else:
+                conversation_context = await memory_task
+
+            return await asyncio.to_thread(
+                self._complete_query,
+                user_query=user_query,
+                query_vector=query_vector,
+                search_results=search_results,
+                conversation_context=conversation_context,
+                start_time=start_time,
+                cache_key=cache_key
+            )
+
         except Exception as e:
             logger.error(f"Error processing query: {e}")
-            return {
-                "response": "I apologize, but I encountered an error while processing your question. Please try again or rephrase your question.",
-                "error": str(e),
-                "sources": []
+            return self._generate_error_response(e)
+
+    def _vector_search(self, user_query: str, query_vector) -> List[Dict]:
+        """Search the vector store, reusing the already-computed query embedding"""
+        # storage/vector_store.py is maintained separately; use its vector-based
+        # entry point when available so the query isn't embedded a second time
+        search_by_vector = getattr(self.vector_store, "search_by_vector", None)
+        if search_by_vector is not None:
+            return search_by_vector(query_vector, top_k=self._top_k)
+        return self.vector_store.search(query=user_query, top_k=self._top_k)
+
+    def _expand_with_graph(self, search_results: List[Dict]):
+        """Expand context with graph-related chunks for the top hits"""
+        chunk_ids = [r["chunk_id"] for r in search_results[:3]]
+        related_chunks = self.graph_rag.get_related_chunks(chunk_ids, max_chunks=3)
+
+        if related_chunks:
+            logger.info(f"Expanded context with {len(related_chunks)} related chunks")
+            # Add related chunks to results (simplified - in production, fetch from store)
+
+    def _build_context(self, search_results: List[Dict]) -> str:
+        """Build the document context block for the LLM"""
+        return "\n".join(
+            f"[Source {i}] (from {result['metadata'].get('filename', 'unknown')}, "
+            f"page {result['metadata'].get('page_number', 'N/A')})\n"
+            f"{result['text']}\n"
+            for i, result in enumerate(search_results[:self._rerank_k], 1)
+        )
+
+    @staticmethod
+    def _sources_from_results(search_results: List[Dict]) -> List[Dict[str, Any]]:
+        """Build the source attribution list from the top search results"""
+        return [
+            {
+                "filename": r["metadata"].get("filename", "unknown"),
+                "page": r["metadata"].get("page_number"),
+                "chunk_id": r["chunk_id"],
+                "score": round(r["score"], 3)
             }
+            for r in search_results[:5]
+        ]
+
+    def _complete_query(
+        self,
+        user_query: str,
+        query_vector,
+        search_results: List[Dict],
+        conversation_context: str,
+        start_time: float,
+        cache_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Generate the non-streaming answer from retrieved context"""
+        context = self._build_context(search_results)
+        prompt = self._build_prompt(user_query, context, conversation_context)
+
+        response = self.llm.generate(
+            prompt=prompt,
+            system_prompt=SARTHI_SYSTEM_PROMPT,
+            stream=False
+        )
+
+        # Add to memory
+        self.memory.add_interaction(
+            user_message=user_query,
+            assistant_response=response,
+            context_chunks=search_results
+        )
+
+        elapsed = time.time() - start_time
+
+        result = {
+            "response": response,
+            "sources": self._sources_from_results(search_results),
+            "processing_time": round(elapsed, 2),
+            "context_used": len(search_results)
+        }
+
+        self.semantic_cache.put(query_vector, result)
+        if cache_key is not None:
+            self.response_cache.put(cache_key, result)
+        return result
+
+    def _generate_error_response(self, error: Exception) -> Dict[str, Any]:
+        """Generate the fallback response for a failed query"""
+        return {
+            "response": "I apologize, but I encountered an error while processing your question. Please try again or rephrase your question.",
+            "error": str(error),
+            "sources": []
+        }
     
     def _build_prompt(
         self,
@@ -223,23 +401,15 @@ class SarthiPipeline:
         conversation_context: str
     ) -> str:
         """Build the prompt for LLM"""
-        prompt_parts = []
-        
-        if conversation_context:
-            prompt_parts.append("=== Previous Conversation ===")
-            prompt_parts.append(conversation_context)
-            prompt_parts.append("")
-        
-        prompt_parts.append("=== Relevant Information from Documents ===")
-        prompt_parts.append(context)
-        prompt_parts.append("")
-        prompt_parts.append("=== User Question ===")
-        prompt_parts.append(query)
-        prompt_parts.append("")
-        prompt_parts.append("=== Your Response ===")
-        prompt_parts.append("Based on the provided information and conversation history, please answer the question accurately and concisely:")
-        
-        return "\n".join(prompt_parts)
+        conversation = (
+            f"{_CONVERSATION_HEADER}\n{conversation_context}\n\n"
+            if conversation_context else ""
+        )
+        return (
+            f"{conversation}{_CONTEXT_HEADER}\n{context}\n\n"
+            f"{_QUESTION_HEADER}\n{query}\n\n"
+            f"{_RESPONSE_HEADER}\n{_RESPONSE_INSTRUCTION}"
+        )
     
     def _generate_no_context_response(self, query: str) -> Dict[str, Any]:
         """Generate response when no relevant context is found"""
@@ -296,17 +466,85 @@ class SarthiPipeline:
         # Send completion
         yield {
             "type": "complete",
-            "sources": [
-                {
-                    "filename": r["metadata"].get("filename", "unknown"),
-                    "page": r["metadata"].get("page_number"),
-                    "score": round(r["score"], 3)
-                }
-                for r in search_results[:5]
-            ],
+            "sources": self._sources_from_results(search_results),
             "processing_time": round(time.time() - start_time, 2)
         }
     
+    async def query_stream_async(
+        self,
+        user_query: str,
+        use_graph_expansion: bool = True
+    ):
+        """Stream a response, overlapping retrieval with the other pre-LLM work"""
+        logger.info(f"Processing streaming query: {user_query[:100]}...")
+        start_time = time.time()
+
+        try:
+            # Kick off retrieval immediately so it overlaps the memory fetch
+            query_vector = await asyncio.to_thread(embedding_model.embed_query, user_query)
+            search_task = asyncio.create_task(
+                asyncio.to_thread(self._vector_search, user_query, query_vector)
+            )
+            memory_task = asyncio.create_task(
+                asyncio.to_thread(self.memory.get_recent_context, n=3)
+            )
+            search_results = await search_task
+
+            if not search_results:
+                await memory_task
+                fallback = self._generate_no_context_response(user_query)
+                yield {"type": "chunk", "content": fallback["response"]}
+                yield {"type": "complete", "sources": [], "processing_time": 0}
+                return
+
+            if use_graph_expansion:
+                _, conversation_context = await asyncio.gather(
+                    asyncio.to_thread(self._expand_with_graph, search_results),
+                    memory_task
+                )
+            else:
+                conversation_context = await memory_task
+
+            context = self._build_context(search_results)
+            prompt = self._build_prompt(user_query, context, conversation_context)
+
+            # Bridge the sync LLM generator without blocking the event loop
+            generator = self.llm.generate(
+                prompt=prompt,
+                system_prompt=SARTHI_SYSTEM_PROMPT,
+                stream=True
+            )
+
+            response_parts = []
+            done = object()
+            while True:
+                chunk = await asyncio.to_thread(next, generator, done)
+                if chunk is done:
+                    break
+                response_parts.append(chunk)
+                yield {"type": "chunk", "content": chunk}
+
+            full_response = "".join(response_parts)
+
+            # Add to memory
+            await asyncio.to_thread(
+                self.memory.add_interaction,
+                user_message=user_query,
+                assistant_response=full_response,
+                context_chunks=search_results
+            )
+
+            # Send completion
+            yield {
+                "type": "complete",
+                "sources": self._sources_from_results(search_results),
+                "processing_time": round(time.time() - start_time, 2)
+            }
+
+        except Exception as e:
+            logger.error(f"Error in streaming query: {e}")
+            yield {"type": "error", "message": str(e)}
+
     def get_system_status(self) -> Dict[str, Any]:
         """Get comprehensive system status"""
         return {
@@ -325,6 +563,9 @@ class SarthiPipeline:
         self.vector_store.clear_all()
         self.graph_rag.clear_all()
         self.memory.clear_history()
+        self.semantic_cache.clear()
+        self.response_cache.clear()
+        embedding_model.cache_clear()
         logger.info("All data cleared")
 
 # Global pipeline instance
@@ -3,12 +3,19 @@ Embeddings module using Ollama
 """
 import ollama
 import numpy as np
-from typing import List, Union
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Tuple, Union
 from config import settings
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+@lru_cache(maxsize=1024)
+def _embed_text_cached(text: str) -> Tuple[float, ...]:
+    """Memoized embedding lookup (tuple so results are hashable)"""
+    return tuple(embedding_model.embed_text(text))
+
 class EmbeddingModel:
     """Embedding model using Ollama"""
     
@@ -34,33 +41,57 @@ class EmbeddingModel:
                 logger.error(f"Failed to pull model: {pull_error}")
                 raise
     
-    def embed_text(self, text: str) -> List[float]:
-        """Generate embedding for a single text"""
+    def embed_text(self, text: str) -> np.ndarray:
+        """Generate embedding for a single text as a float32 array"""
         try:
             response = self.client.embeddings(
                 model=self.model_name,
                 prompt=text
             )
-            return response['embedding']
+            return np.asarray(response['embedding'], dtype=np.float32)
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
             raise
     
-    def embed_batch(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for a batch of texts"""
-        embeddings = []
-        for text in texts:
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Generate embeddings for a batch of texts as an (N, dim) float32 array"""
+        if not texts:
+            return np.empty((0, settings.QDRANT_VECTOR_SIZE), dtype=np.float32)
+
+        # Prefer the batched endpoint (single HTTP call) when the client has it
+        try:
+            response = self.client.embed(model=self.model_name, input=texts)
+            return np.asarray(response['embeddings'], dtype=np.float32)
+        except AttributeError:
+            pass
+        except Exception as e:
+            logger.error(f"Batch embedding call failed, retrying once: {e}")
             try:
-                embedding = self.embed_text(text)
-                embeddings.append(embedding)
+                response = self.client.embed(model=self.model_name, input=texts)
+                return np.asarray(response['embeddings'], dtype=np.float32)
+            except Exception as retry_error:
+                logger.error(f"Batch embedding retry failed: {retry_error}")
+                return np.zeros((len(texts), settings.QDRANT_VECTOR_SIZE), dtype=np.float32)
+
+        # Older clients: fan out per-text calls across a thread pool
+        def _embed_or_zero(text: str) -> np.ndarray:
+            try:
+                return self.embed_text(text)
             except Exception as e:
                 logger.error(f"Error in batch embedding: {e}")
-                embeddings.append([0.0] * settings.QDRANT_VECTOR_SIZE)
-        return embeddings
+                return np.zeros(settings.QDRANT_VECTOR_SIZE, dtype=np.float32)
+
+        with ThreadPoolExecutor(max_workers=settings.MAX_WORKERS) as executor:
+            return np.vstack(list(executor.map(_embed_or_zero, texts)))
     
-    def embed_query(self, query: str) -> List[float]:
-        """Generate embedding for a query (alias for consistency)"""
-        return self.embed_text(query)
+    def embed_query(self, query: str) -> np.ndarray:
+        """Generate embedding for a query (cached for repeat queries)"""
+        return np.asarray(_embed_text_cached(query.strip().lower()), dtype=np.float32)
+
+    def cache_clear(self):
+        """Clear the query embedding cache"""
+        _embed_text_cached.cache_clear()
+        logger.info("Query embedding cache cleared")
 
 # Global embedding model instance
 embedding_model = EmbeddingModel()
\ No newline at end of file
@@ -1,115 +1,302 @@
 """
 Graph-based RAG for enhanced context understanding
 """
-import json
+import orjson
+import pickle
+import re
+import threading
 import networkx as nx
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Set, Tuple
-from collections import defaultdict
+from collections import Counter, defaultdict, deque
 from config import settings
 from utils.logger import get_logger
 from processing.chunking import Chunk
 
 logger = get_logger(__name__)
 
+# Single fused entity pattern so each chunk's text is scanned only once;
+# which named group matched tells us the entity type
+_ENTITY_RE = re.compile(
+    r'(?P<section>section\s+(\d+))|(?P<chapter>chapter\s+([IVX\d]+))',
+    re.IGNORECASE
+)
+
 class GraphRAG:
     """Graph-based RAG for document relationships and enhanced retrieval"""
     
     def __init__(self):
         self.graph = nx.DiGraph()
-        self.graph_file = settings.GRAPH_PATH / "document_graph.json"
+        self.graph_file = settings.GRAPH_PATH / "document_graph.pkl"
+        self.legacy_graph_file = settings.GRAPH_PATH / "document_graph.json"
+        self.wal_file = settings.GRAPH_PATH / "document_graph.wal"
+        # Reverse index: entity id -> chunk ids referencing it
+        self._entity_to_chunks: Dict[str, Set[str]] = defaultdict(set)
+        # Chunk text lives in the chunk store (injected by the pipeline),
+        # not on graph nodes
+        self._chunk_store = None
+        # Documents are ingested from a thread pool; serialize graph
+        # mutation and WAL writes so records can't interleave on disk
+        self._lock = threading.RLock()
         self._load_graph()
+        self._drop_legacy_text_attrs()
+        self._rebuild_entity_index()
         logger.info("Graph RAG initialized")
-    
+
     def _load_graph(self):
         """Load existing graph from disk"""
         if self.graph_file.exists():
             try:
-                with open(self.graph_file, 'r') as f:
-                    data = json.load(f)
-                
-                # Reconstruct graph
-                self.graph = nx.node_link_graph(data)
+                with open(self.graph_file, 'rb') as f:
+                    self.graph = pickle.load(f)
                 logger.info(f"Loaded graph with {self.graph.number_of_nodes()} nodes and {self.graph.number_of_edges()} edges")
             except Exception as e:
                 logger.error(f"Error loading graph: {e}")
                 self.graph = nx.DiGraph()
+        elif self.legacy_graph_file.exists():
+            # One-time migration from the old JSON node-link format
+            try:
+                self.graph = self._load_legacy_json()
+                self._save_graph()
+                logger.info(
+                    f"Migrated legacy JSON graph ({self.graph.number_of_nodes()} nodes) "
+                    f"to {self.graph_file.name}"
+                )
+            except Exception as e:
+                logger.error(f"Error migrating legacy graph: {e}")
+                self.graph = nx.DiGraph()
         else:
             logger.info("No existing graph found, starting fresh")
-    
+
+        self._replay_wal()
+
+    def _load_legacy_json(self) -> nx.DiGraph:
+        """Parse the legacy node-link JSON file into a graph
+
+        With ijson the nodes and links arrays are streamed straight into
+        the graph, so peak memory is one record instead of the whole
+        parsed dict on top of the finished graph; otherwise the file is
+        parsed in one go with orjson.
+        """
+        try:
+            import ijson
+        except ImportError:
+            ijson = None
+
+        if ijson is not None:
+            graph = nx.DiGraph()
+            with open(self.legacy_graph_file, 'rb') as f:
+                for node in ijson.items(f, 'nodes.item', use_float=True):
+                    attrs = dict(node)
+                    graph.add_node(attrs.pop('id'), **attrs)
+                # networkx <3.6 wrote the edge list under "links",
+                # newer versions under "edges" - accept either
+                for edges_key in ('links.item', 'edges.item'):
+                    f.seek(0)
+                    for link in ijson.items(f, edges_key, use_float=True):
+                        attrs = dict(link)
+                        graph.add_edge(attrs.pop('source'), attrs.pop('target'), **attrs)
+            return graph
+
+        with open(self.legacy_graph_file, 'rb') as f:
+            return nx.node_link_graph(orjson.loads(f.read()))
+
+    def _drop_legacy_text_attrs(self):
+        """Strip chunk text carried on nodes by graphs saved before the split"""
+        dropped = 0
+        for attrs in self.graph._node.values():
+            if attrs.get('node_type') == 'chunk' and attrs.pop('text', None) is not None:
+                dropped += 1
+        if dropped:
+            logger.info(f"Dropped legacy text attributes from {dropped} chunk nodes")
+
+    def set_chunk_store(self, store):
+        """Inject the store used to resolve chunk text by id"""
+        self._chunk_store = store
+
+    def get_chunk_text(self, chunk_id: str) -> Optional[str]:
+        """Look up a chunk's text from the injected chunk store"""
+        if self._chunk_store is not None:
+            getter = getattr(self._chunk_store, 'get_chunk_text', None)
+            if getter is not None:
+                return getter(chunk_id)
+
+        # Fall back to any text still present on the node itself
+        attrs = self.graph._node.get(chunk_id)
+        return attrs.get('text') if attrs else None
+
+    def _rebuild_entity_index(self):
+        """Rebuild the entity -> referencing-chunks index in one edge pass"""
+        self._entity_to_chunks = defaultdict(set)
+        for u, v, relation in self.graph.edges(data='relation'):
+            if relation == 'references':
+                self._entity_to_chunks[v].add(u)
+
+    def _wal_append(self, op: str, payload: Dict[str, Any]):
+        """Append one mutation record to the write-ahead log"""
+        try:
+            with open(self.wal_file, 'ab') as f:
+                f.write(orjson.dumps({"op": op, **payload}) + b"\n")
+        except Exception as e:
+            logger.error(f"Error appending to graph WAL: {e}")
+
+    def _replay_wal(self):
+        """Re-apply mutations logged since the last checkpoint"""
+        if not self.wal_file.exists():
+            return
+
+        try:
+            replayed = 0
+            skipped = 0
+            with open(self.wal_file, 'rb') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+
+                    # A corrupt record (e.g. a write cut short by a crash)
+                    # loses only itself, not the rest of the log
+                    try:
+                        record = orjson.loads(line)
+                        if record["op"] == "add":
+                            self.graph.add_nodes_from(
+                                (node, attrs) for node, attrs in record["nodes"]
+                            )
+                            self.graph.add_edges_from(
+                                (u, v, data) for u, v, data in record["edges"]
+                            )
+                        elif record["op"] == "delete_document":
+                            self._apply_delete(record["doc_id"])
+                        replayed += 1
+                    except Exception as e:
+                        skipped += 1
+                        logger.warning(f"Skipping corrupt graph WAL record: {e}")
+
+            if replayed:
+                logger.info(f"Replayed {replayed} graph WAL records")
+            if skipped:
+                logger.error(f"Skipped {skipped} corrupt graph WAL records")
+        except Exception as e:
+            logger.error(f"Error replaying graph WAL: {e}")
+
+    def checkpoint(self):
+        """Write a full graph snapshot and truncate the WAL"""
+        with self._lock:
+            self._save_graph()
+            try:
+                self.wal_file.unlink(missing_ok=True)
+            except Exception as e:
+                logger.error(f"Error truncating graph WAL: {e}")
+
+    def _maybe_checkpoint(self):
+        """Checkpoint once the WAL outgrows a quarter of the last snapshot"""
+        if not self.wal_file.exists():
+            return
+
+        wal_size = self.wal_file.stat().st_size
+        snapshot_size = self.graph_file.stat().st_size if self.graph_file.exists() else 0
+        if snapshot_size == 0 or wal_size * 4 > snapshot_size:
+            self.checkpoint()
+
     def _save_graph(self):
         """Save graph to disk"""
         try:
-            data = nx.node_link_data(self.graph)
-            with open(self.graph_file, 'w') as f:
-                json.dump(data, f, indent=2)
+            with open(self.graph_file, 'wb') as f:
+                pickle.dump(self.graph, f, protocol=pickle.HIGHEST_PROTOCOL)
             logger.info("Graph saved successfully")
         except Exception as e:
             logger.error(f"Error saving graph: {e}")
     
-    def add_document(self, doc_id: str, chunks: List[Chunk], metadata: Dict[str, Any]):
-        """Add document and its chunks to the graph"""
+    def add_document(
+        self,
+        doc_id: str,
+        chunks: List[Chunk],
+        metadata: Dict[str, Any],
+        flush: bool = True
+    ):
+        """Add document and its chunks to the graph
+
+        Mutations are appended to the write-ahead log, so disk I/O is
+        proportional to the new document rather than the whole graph. With
+        flush=False even the WAL-size checkpoint check is skipped so bulk
+        ingests can checkpoint once at the end via flush().
+        """
         try:
-            # Add document node
-            self.graph.add_node(
-                doc_id,
-                node_type="document",
-                **metadata
-            )
-            
-            # Add chunk nodes and edges
-            for i, chunk in enumerate(chunks):
-                chunk_id = chunk.chunk_id
-                
-                # Add chunk node
-                self.graph.add_node(
-                    chunk_id,
-                    node_type="chunk",
-                    text=chunk.text,
-                    chunk_num=i,
-                    **chunk.metadata
-                )
-                
-                # Add edge from document to chunk
-                self.graph.add_edge(doc_id, chunk_id, relation="contains")
-                
-                # Add sequential edges between chunks
-                if i > 0:
-                    prev_chunk_id = chunks[i-1].chunk_id
-                    self.graph.add_edge(prev_chunk_id, chunk_id, relation="precedes")
-                
-                # Extract and link entities (sections, chapters, etc.)
-                self._extract_and_link_entities(chunk)
-            
-            self._save_graph()
+            with self._lock:
+                # Unchanged content means identical nodes and edges - skip the re-add
+                content_hash = metadata.get("content_hash")
+                if content_hash is not None:
+                    existing = self.graph._node.get(doc_id)
+                    if existing is not None and existing.get("content_hash") == content_hash:
+                        logger.info(f"Document {doc_id} unchanged, skipping graph add")
+                        return
+
+                # Collect all mutations and apply them in two batched calls
+                nodes = [(doc_id, {"node_type": "document", **metadata})]
+                edges = []
+
+                for i, chunk in enumerate(chunks):
+                    chunk_id = chunk.chunk_id
+
+                    # Text stays in the chunk store; the node carries only
+                    # structure, which keeps snapshots and the WAL small
+                    nodes.append((chunk_id, {
+                        "node_type": "chunk",
+                        "chunk_num": i,
+                        **chunk.metadata
+                    }))
+                    edges.append((doc_id, chunk_id, {"relation": "contains"}))
+
+                    # Sequential edges between chunks
+                    if i > 0:
+                        edges.append((chunks[i-1].chunk_id, chunk_id, {"relation": "precedes"}))
+
+                    # Extract and link entities (sections, chapters, etc.)
+                    entity_nodes, entity_edges = self._extract_and_link_entities(chunk)
+                    nodes.extend(entity_nodes)
+                    edges.extend(entity_edges)
+
+                self.graph.add_nodes_from(nodes)
+                self.graph.add_edges_from(edges)
+                for u, v, data in edges:
+                    if data.get("relation") == "references":
+                        self._entity_to_chunks[v].add(u)
+                self._wal_append("add", {"nodes": nodes, "edges": edges})
+
+                if flush:
+                    self._maybe_checkpoint()
             logger.info(f"Added document {doc_id} to graph with {len(chunks)} chunks")
-            
+
         except Exception as e:
             logger.error(f"Error adding document to graph: {e}")
+
+    def flush(self):
+        """Checkpoint the graph after a batch of additions"""
+        self.checkpoint()
     
-    def _extract_and_link_entities(self, chunk: Chunk):
-        """Extract and link entities from chunk text"""
-        import re
-        
-        # Extract section references
-        section_pattern = r'section\s+(\d+)'
-        sections = re.findall(section_pattern, chunk.text, re.IGNORECASE)
-        
-        for section in sections:
-            entity_id = f"section_{section}"
-            if not self.graph.has_node(entity_id):
-                self.graph.add_node(entity_id, node_type="section", section_num=section)
-            self.graph.add_edge(chunk.chunk_id, entity_id, relation="references")
-        
-        # Extract chapter references
-        chapter_pattern = r'chapter\s+([IVX\d]+)'
-        chapters = re.findall(chapter_pattern, chunk.text, re.IGNORECASE)
-        
-        for chapter in chapters:
-            entity_id = f"chapter_{chapter}"
-            if not self.graph.has_node(entity_id):
-                self.graph.add_node(entity_id, node_type="chapter", chapter_num=chapter)
-            self.graph.add_edge(chunk.chunk_id, entity_id, relation="references")
+    def _extract_and_link_entities(
+        self,
+        chunk: Chunk
+    ) -> Tuple[List[Tuple[str, Dict]], List[Tuple[str, str, Dict]]]:
+        """Collect section/chapter entity nodes and edges in one pass over the text"""
+        existing = self.graph.nodes
+        nodes = []
+        edges = []
+
+        for match in _ENTITY_RE.finditer(chunk.text):
+            if match.group('section'):
+                section = match.group(2)
+                entity_id = f"section_{section}"
+                if entity_id not in existing:
+                    nodes.append((entity_id, {"node_type": "section", "section_num": section}))
+            else:
+                chapter = match.group(4)
+                entity_id = f"chapter_{chapter}"
+                if entity_id not in existing:
+                    nodes.append((entity_id, {"node_type": "chapter", "chapter_num": chapter}))
+
+            edges.append((chunk.chunk_id, entity_id, {"relation": "references"}))
+
+        return nodes, edges
     
     def get_related_chunks(
         self,
@@ -120,21 +307,38 @@ class GraphRAG:
         """Get related chunks using graph traversal"""
         try:
             related = set()
-            
+            # Bind the raw node-attribute dict once; NodeView.__getitem__ adds
+            # measurable overhead at this call frequency
+            node_data = self.graph._node
+            succ = self.graph._succ
+
             for chunk_id in chunk_ids:
-                if not self.graph.has_node(chunk_id):
+                if chunk_id not in node_data:
                     continue
-                
-                # Get neighbors within max_depth
-                for node in nx.single_source_shortest_path_length(
-                    self.graph, chunk_id, cutoff=max_depth
-                ):
-                    if self.graph.nodes[node].get('node_type') == 'chunk':
-                        related.add(node)
-                
+
+                # Bounded BFS: stop expanding as soon as we have enough chunks
+                # instead of computing the full max_depth neighborhood
+                seen = {chunk_id}
+                queue = deque([(chunk_id, 0)])
+
+                while queue and len(related) < max_chunks:
+                    node, depth = queue.popleft()
+                    if depth >= max_depth:
+                        continue
+
+                    for neighbor in succ[node]:
+                        if neighbor in seen:
+                            continue
+                        seen.add(neighbor)
+                        if node_data[neighbor].get('node_type') == 'chunk':
+                            related.add(neighbor)
+                            if len(related) >= max_chunks:
+                                break
+                        queue.append((neighbor, depth + 1))
+
                 if len(related) >= max_chunks:
                     break
-            
+
             return list(related)[:max_chunks]
             
         except Exception as e:
@@ -144,37 +348,45 @@ class GraphRAG:
     def get_document_structure(self, doc_id: str) -> Dict[str, Any]:
         """Get hierarchical structure of a document"""
         try:
-            if not self.graph.has_node(doc_id):
+            node_data = self.graph._node
+            succ = self.graph._succ
+
+            if doc_id not in node_data:
                 return {}
-            
+
             structure = {
                 "doc_id": doc_id,
-                "metadata": dict(self.graph.nodes[doc_id]),
+                "metadata": dict(node_data[doc_id]),
                 "chunks": [],
                 "entities": defaultdict(list)
             }
-            
-            # Get all chunks
-            for successor in self.graph.successors(doc_id):
-                if self.graph.nodes[successor].get('node_type') == 'chunk':
-                    chunk_info = {
-                        "chunk_id": successor,
-                        "chunk_num": self.graph.nodes[successor].get('chunk_num'),
-                        "references": []
-                    }
-                    
-                    # Get entity references
-                    for entity in self.graph.successors(successor):
-                        entity_type = self.graph.nodes[entity].get('node_type')
-                        if entity_type in ['section', 'chapter']:
-                            chunk_info["references"].append({
-                                "type": entity_type,
-                                "id": entity
-                            })
-                            structure["entities"][entity_type].append(entity)
-                    
-                    structure["chunks"].append(chunk_info)
-            
+
+            chunks = structure["chunks"]
+            entities = structure["entities"]
+
+            # Single pass over adjacency: one attribute-dict lookup per
+            # chunk and per entity, appending into bound locals
+            for chunk_id in succ[doc_id]:
+                chunk_attrs = node_data[chunk_id]
+                if chunk_attrs.get('node_type') != 'chunk':
+                    continue
+
+                references = []
+                for entity in succ[chunk_id]:
+                    entity_type = node_data[entity].get('node_type')
+                    if entity_type in ('section', 'chapter'):
+                        references.append({
+                            "type": entity_type,
+                            "id": entity
+                        })
+                        entities[entity_type].append(entity)
+
+                chunks.append({
+                    "chunk_id": chunk_id,
+                    "chunk_num": chunk_attrs.get('chunk_num'),
+                    "references": references
+                })
+
             return structure
             
         except Exception as e:
@@ -184,23 +396,24 @@ class GraphRAG:
     def find_cross_references(self, chunk_id: str) -> List[str]:
         """Find chunks that reference similar entities"""
         try:
-            if not self.graph.has_node(chunk_id):
+            node_data = self.graph._node
+
+            if chunk_id not in node_data:
                 return []
-            
+
             # Get entities referenced by this chunk
             entities = [
-                n for n in self.graph.successors(chunk_id)
-                if self.graph.nodes[n].get('node_type') in ['section', 'chapter']
+                n for n in self.graph._succ[chunk_id]
+                if node_data[n].get('node_type') in ['section', 'chapter']
             ]
             
-            # Find other chunks referencing the same entities
-            cross_refs = set()
-            for entity in entities:
-                for predecessor in self.graph.predecessors(entity):
-                    if (self.graph.nodes[predecessor].get('node_type') == 'chunk' 
-                        and predecessor != chunk_id):
-                        cross_refs.add(predecessor)
-            
+            if not entities:
+                return []
+
+            # Union the reverse index instead of scanning entity predecessors
+            cross_refs = set().union(*(self._entity_to_chunks[e] for e in entities))
+            cross_refs.discard(chunk_id)
+
             return list(cross_refs)
             
         except Exception as e:
@@ -210,11 +423,11 @@ class GraphRAG:
     def get_graph_stats(self) -> Dict[str, Any]:
         """Get statistics about the graph"""
         try:
-            node_types = defaultdict(int)
-            for node in self.graph.nodes():
-                node_type = self.graph.nodes[node].get('node_type', 'unknown')
-                node_types[node_type] += 1
-            
+            node_types = Counter(
+                attrs.get('node_type', 'unknown')
+                for attrs in self.graph._node.values()
+            )
+
             return {
                 "total_nodes": self.graph.number_of_nodes(),
                 "total_edges": self.graph.number_of_edges(),
@@ -225,32 +438,46 @@ class GraphRAG:
             logger.error(f"Error getting graph stats: {e}")
             return {}
     
+    def _apply_delete(self, doc_id: str):
+        """Remove a document and its chunk nodes from the in-memory graph"""
+        if not self.graph.has_node(doc_id):
+            return
+
+        # Get all chunk nodes
+        chunks_to_remove = [
+            n for n in self.graph.successors(doc_id)
+            if self.graph.nodes[n].get('node_type') == 'chunk'
+        ]
+
+        # Remove chunks and their edges
+        for chunk in chunks_to_remove:
+            for entity in self.graph.successors(chunk):
+                chunk_set = self._entity_to_chunks.get(entity)
+                if chunk_set is not None:
+                    chunk_set.discard(chunk)
+            self.graph.remove_node(chunk)
+
+        # Remove document node
+        self.graph.remove_node(doc_id)
+
     def delete_document(self, doc_id: str):
         """Remove document and its chunks from the graph"""
         try:
-            if self.graph.has_node(doc_id):
-                # Get all chunk nodes
-                chunks_to_remove = [
-                    n for n in self.graph.successors(doc_id)
-                    if self.graph.nodes[n].get('node_type') == 'chunk'
-                ]
-                
-                # Remove chunks and their edges
-                for chunk in chunks_to_remove:
-                    self.graph.remove_node(chunk)
-                
-                # Remove document node
-                self.graph.remove_node(doc_id)
-                
-                self._save_graph()
-                logger.info(f"Removed document {doc_id} from graph")
+            with self._lock:
+                if self.graph.has_node(doc_id):
+                    self._apply_delete(doc_id)
+                    self._wal_append("delete_document", {"doc_id": doc_id})
+                    self._maybe_checkpoint()
+                    logger.info(f"Removed document {doc_id} from graph")
         except Exception as e:
             logger.error(f"Error deleting document from graph: {e}")
-    
+
     def clear_all(self):
         """Clear entire graph"""
-        self.graph = nx.DiGraph()
-        self._save_graph()
+        with self._lock:
+            self.graph = nx.DiGraph()
+            self._entity_to_chunks = defaultdict(set)
+            self.checkpoint()
         logger.info("Graph cleared")
 
 # Global graph RAG instance
@@ -2,13 +2,86 @@
 Advanced text chunking with semantic awareness
 """
 import re
-from typing import List, Dict, Any
+import numpy as np
+from typing import Iterable, Iterator, List, Dict, Any, Tuple
 from dataclasses import dataclass
 from config import settings
 from utils.logger import get_logger
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to the interpreted kernel
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+
+        def wrap(func):
+            return func
+        return wrap
+
 logger = get_logger(__name__)
 
+# Precompiled patterns - these run per line/sentence on every document ingest
+_SENTENCE_RE = re.compile(r'(?<=[.!?।])\s+(?=[A-Z]|[०-९]|\d)')
+# All three section shapes fused into one alternation so each line is
+# matched at most once; the named group that matched gives the type
+_SECTION_ANY_RE = re.compile(
+    r'^(?:(?P<chapter>(?:CHAPTER|अध्याय)\s+[IVX\d]+)'
+    r'|(?P<section>\d+\.\s+[A-Z][^.]+)'
+    r'|(?P<subsection>\([a-z]\)))',
+    re.IGNORECASE
+)
+
+@njit(cache=True)
+def _plan_chunks(lens, chunk_size, overlap):
+    """Compute (start, end) sentence-index pairs for each chunk
+
+    Pure integer arithmetic over sentence lengths, extracted from
+    chunk_text so numba can compile the hot accumulation/overlap loops;
+    the sentence strings themselves are sliced by the caller.
+    """
+    n = lens.shape[0]
+    starts = np.empty(n + 1, np.int32)
+    ends = np.empty(n + 1, np.int32)
+
+    # Prefix sums let both the size check and the overlap boundary be
+    # answered from two lookups instead of re-summing sentence lengths
+    prefix = np.empty(n + 1, np.int64)
+    prefix[0] = 0
+    for i in range(n):
+        prefix[i + 1] = prefix[i] + lens[i]
+
+    k = 0
+    start = 0
+
+    for i in range(n):
+        # Emit the current chunk before this sentence would overflow it
+        if prefix[i] - prefix[start] + lens[i] > chunk_size and i > start:
+            starts[k] = start
+            ends[k] = i
+            k += 1
+
+            # The overlap suffix is the smallest j with
+            # prefix[i] - prefix[j] <= overlap; binary search for it
+            target = prefix[i] - overlap
+            lo = start
+            hi = i
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if prefix[mid] < target:
+                    lo = mid + 1
+                else:
+                    hi = mid
+
+            start = lo
+
+    if n > start:
+        starts[k] = start
+        ends[k] = n
+        k += 1
+
+    return starts[:k], ends[:k]
+
 @dataclass
 class Chunk:
     """Text chunk dataclass"""
@@ -30,41 +103,34 @@ class SemanticChunker:
     
     def _split_into_sentences(self, text: str) -> List[str]:
         """Split text into sentences using regex"""
-        # Pattern to split on sentence boundaries
-        sentence_pattern = r'(?<=[.!?।])\s+(?=[A-Z]|[०-९]|\d)'
-        sentences = re.split(sentence_pattern, text)
+        sentences = _SENTENCE_RE.split(text)
         return [s.strip() for s in sentences if s.strip()]
     
     def _identify_sections(self, text: str) -> List[Dict[str, Any]]:
         """Identify document sections (chapters, articles, etc.)"""
         sections = []
-        
-        # Patterns for section headers
-        patterns = [
-            (r'^(CHAPTER|अध्याय)\s+([IVX\d]+)', 'chapter'),
-            (r'^(\d+)\.\s+([A-Z][^.]+)', 'section'),
-            (r'^\(([a-z])\)', 'subsection'),
-        ]
-        
+
         lines = text.split('\n')
         current_section = None
-        
+
         for line_num, line in enumerate(lines):
             line = line.strip()
-            if not line:
+
+            # Cheap prefilter: a section heading can only start with an
+            # alphanumeric character or '(' - skip the regex otherwise
+            first = line[:1]
+            if not (first.isalnum() or first == '('):
                 continue
-            
-            for pattern, section_type in patterns:
-                match = re.match(pattern, line, re.IGNORECASE)
-                if match:
-                    sections.append({
-                        'line_num': line_num,
-                        'type': section_type,
-                        'title': line,
-                        'start': line_num
-                    })
-                    break
-        
+
+            match = _SECTION_ANY_RE.match(line)
+            if match:
+                sections.append({
+                    'line_num': line_num,
+                    'type': match.lastgroup,
+                    'title': line,
+                    'start': line_num
+                })
+
         return sections
     
     def chunk_text(
@@ -85,75 +151,105 @@ class SemanticChunker:
         if not sentences:
             logger.warning(f"No sentences found in document {doc_id}")
             return chunks
-        
-        current_chunk = []
-        current_length = 0
-        chunk_num = 0
-        
-        for i, sentence in enumerate(sentences):
-            sentence_length = len(sentence)
-            
-            # Check if adding this sentence would exceed chunk size
-            if current_length + sentence_length > self.chunk_size and current_chunk:
-                # Create chunk
-                chunk_text = ' '.join(current_chunk)
-                chunk_id = f"{doc_id}_chunk_{chunk_num}"
-                
-                chunk_metadata = {
-                    **metadata,
-                    "chunk_id": chunk_id,
-                    "chunk_num": chunk_num,
-                    "start_sentence": i - len(current_chunk),
-                    "end_sentence": i,
-                    "chunk_length": current_length
-                }
-                
-                chunks.append(Chunk(
-                    text=chunk_text,
-                    metadata=chunk_metadata,
-                    chunk_id=chunk_id
-                ))
-                
-                # Calculate overlap
-                overlap_sentences = []
-                overlap_length = 0
-                
-                for sent in reversed(current_chunk):
-                    if overlap_length + len(sent) <= self.chunk_overlap:
-                        overlap_sentences.insert(0, sent)
-                        overlap_length += len(sent)
-                    else:
-                        break
-                
-                current_chunk = overlap_sentences
-                current_length = overlap_length
-                chunk_num += 1
-            
-            current_chunk.append(sentence)
-            current_length += sentence_length
-        
-        # Add final chunk
-        if current_chunk:
-            chunk_text = ' '.join(current_chunk)
+
+        # Plan chunk boundaries in the compiled kernel, then slice the
+        # sentence list by the returned index pairs
+        lens = np.fromiter(
+            (len(s) for s in sentences), dtype=np.int32, count=len(sentences)
+        )
+        starts, ends = _plan_chunks(lens, self.chunk_size, self.chunk_overlap)
+        prefix = np.concatenate(([0], np.cumsum(lens)))
+
+        for chunk_num, (start, end) in enumerate(zip(starts, ends)):
+            chunk_text = ' '.join(sentences[start:end])
             chunk_id = f"{doc_id}_chunk_{chunk_num}"
-            
+
             chunk_metadata = {
                 **metadata,
                 "chunk_id": chunk_id,
                 "chunk_num": chunk_num,
-                "start_sentence": len(sentences) - len(current_chunk),
-                "end_sentence": len(sentences),
-                "chunk_length": current_length
+                "start_sentence": int(start),
+                "end_sentence": int(end),
+                "chunk_length": int(prefix[end] - prefix[start])
             }
-            
+
             chunks.append(Chunk(
                 text=chunk_text,
                 metadata=chunk_metadata,
                 chunk_id=chunk_id
             ))
-        
+
         logger.info(f"Created {len(chunks)} chunks for document {doc_id}")
         return chunks
 
+    def chunk_stream(
+        self,
+        page_iter: Iterable[Tuple[int, str]],
+        metadata: Dict[str, Any],
+        doc_id: str
+    ) -> Iterator[Chunk]:
+        """Chunk a stream of (page_num, text) pages without joining them
+
+        Keeps a rolling sentence buffer across page boundaries, so peak
+        memory is one page plus one chunk rather than the whole document.
+        Boundary and overlap semantics match chunk_text.
+        """
+        current_chunk: List[str] = []
+        current_length = 0
+        chunk_num = 0
+        chunk_start = 0
+        sentence_index = 0
+
+        def make_chunk(end: int, page_num: int) -> Chunk:
+            chunk_id = f"{doc_id}_chunk_{chunk_num}"
+            return Chunk(
+                text=' '.join(current_chunk),
+                metadata={
+                    **metadata,
+                    "chunk_id": chunk_id,
+                    "chunk_num": chunk_num,
+                    "page_number": page_num,
+                    "start_sentence": chunk_start,
+                    "end_sentence": end,
+                    "chunk_length": current_length
+                },
+                chunk_id=chunk_id
+            )
+
+        last_page = 0
+        for page_num, page_text in page_iter:
+            last_page = page_num
+
+            for sentence in self._split_into_sentences(page_text):
+                sentence_length = len(sentence)
+
+                if current_length + sentence_length > self.chunk_size and current_chunk:
+                    yield make_chunk(sentence_index, page_num)
+                    chunk_num += 1
+
+                    # Keep the overlap suffix for the next chunk
+                    overlap_sentences = []
+                    overlap_length = 0
+                    for sent in reversed(current_chunk):
+                        if overlap_length + len(sent) <= self.chunk_overlap:
+                            overlap_sentences.insert(0, sent)
+                            overlap_length += len(sent)
+                        else:
+                            break
+
+                    current_chunk = overlap_sentences
+                    current_length = overlap_length
+                    chunk_start = sentence_index - len(current_chunk)
+
+                current_chunk.append(sentence)
+                current_length += sentence_length
+                sentence_index += 1
+
+        if current_chunk:
+            yield make_chunk(sentence_index, last_page)
+            chunk_num += 1
+
+        logger.info(f"Created {chunk_num} chunks for document {doc_id}")
+
 # Global chunker instance
 chunker = SemanticChunker()
\ No newline at end of file
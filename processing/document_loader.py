@@ -1,13 +1,26 @@
 """
 Document loader for PDF files
 """
+import hashlib
+import os
+import pickle
 import pypdf
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import Iterator, List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 from config import settings
 from utils.logger import get_logger
 
+try:
+    # Much faster extraction via MuPDF's C core; "fitz" is the legacy alias
+    import pymupdf as fitz
+except ImportError:
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+
 logger = get_logger(__name__)
 
 @dataclass
@@ -22,50 +35,123 @@ class DocumentLoader:
     
     def __init__(self):
         self.documents_dir = settings.DOCUMENTS_DIR
-        logger.info(f"Document loader initialized. Documents directory: {self.documents_dir}")
-    
-    def load_pdf(self, file_path: Path) -> Optional[Document]:
-        """Load a single PDF file"""
-        try:
-            logger.info(f"Loading PDF: {file_path.name}")
-            
-            with open(file_path, 'rb') as file:
-                pdf_reader = pypdf.PdfReader(file)
-                
-                # Extract metadata
-                metadata = {
+        self._use_fitz = fitz is not None and settings.PDF_BACKEND != "pypdf"
+        self._info_fingerprint = None
+        self._info_cache: List[Dict[str, Any]] = []
+        self._file_info_cache: Dict[Tuple[str, int, int], Dict[str, Any]] = {}
+        backend = "pymupdf" if self._use_fitz else "pypdf"
+        logger.info(f"Document loader initialized ({backend}). Documents directory: {self.documents_dir}")
+
+    def get_pdf_metadata(self, file_path: Path) -> Dict[str, Any]:
+        """Extract document-level metadata without reading page text"""
+        if self._use_fitz:
+            doc = fitz.open(str(file_path))
+            try:
+                return {
                     "filename": file_path.name,
                     "filepath": str(file_path),
-                    "num_pages": len(pdf_reader.pages),
-                    "title": pdf_reader.metadata.get('/Title', file_path.stem) if pdf_reader.metadata else file_path.stem,
+                    "num_pages": doc.page_count,
+                    "title": (doc.metadata or {}).get("title") or file_path.stem,
                 }
-                
-                # Extract text from all pages
-                full_text = []
-                for page_num, page in enumerate(pdf_reader.pages, 1):
+            finally:
+                doc.close()
+
+        with open(file_path, 'rb') as file:
+            pdf_reader = pypdf.PdfReader(file)
+            return {
+                "filename": file_path.name,
+                "filepath": str(file_path),
+                "num_pages": len(pdf_reader.pages),
+                "title": pdf_reader.metadata.get('/Title', file_path.stem) if pdf_reader.metadata else file_path.stem,
+            }
+
+    def iter_pages(self, file_path: Path) -> Iterator[Tuple[int, str]]:
+        """Yield (page_num, text) one page at a time
+
+        Streaming entry point for ingest: only one page of text is held
+        in memory at a time instead of the whole document string.
+        """
+        if self._use_fitz:
+            doc = fitz.open(str(file_path))
+            try:
+                for page_num, page in enumerate(doc, 1):
                     try:
-                        page_text = page.extract_text()
+                        page_text = page.get_text("text")
                         if page_text.strip():
-                            full_text.append(page_text)
+                            yield page_num, page_text
                     except Exception as e:
                         logger.warning(f"Error extracting text from page {page_num} of {file_path.name}: {e}")
-                
-                content = "\n\n".join(full_text)
-                
-                if not content.strip():
-                    logger.warning(f"No text content extracted from {file_path.name}")
-                    return None
-                
-                doc_id = file_path.stem
-                
-                logger.info(f"Successfully loaded {file_path.name}: {len(content)} characters, {metadata['num_pages']} pages")
-                
-                return Document(
-                    content=content,
-                    metadata=metadata,
-                    doc_id=doc_id
-                )
-        
+            finally:
+                doc.close()
+            return
+
+        with open(file_path, 'rb') as file:
+            pdf_reader = pypdf.PdfReader(file)
+
+            for page_num, page in enumerate(pdf_reader.pages, 1):
+                try:
+                    page_text = page.extract_text()
+                    if page_text.strip():
+                        yield page_num, page_text
+                except Exception as e:
+                    logger.warning(f"Error extracting text from page {page_num} of {file_path.name}: {e}")
+
+    def file_hash(self, file_path: Path) -> str:
+        """Content hash of a file, used to key caches of derived artifacts"""
+        digest = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def load_pdf(self, file_path: Path) -> Optional[Document]:
+        """Load a single PDF file into a whole-document Document
+
+        Extraction is deterministic given the file bytes, so the result
+        is memoized on disk keyed by content hash; re-ingesting an
+        unchanged file skips extraction entirely.
+        """
+        try:
+            logger.info(f"Loading PDF: {file_path.name}")
+
+            cache_file = settings.CACHE_PATH / f"{self.file_hash(file_path)}.doc.pkl"
+            if cache_file.exists():
+                try:
+                    with open(cache_file, 'rb') as file:
+                        doc = pickle.load(file)
+                    logger.info(f"Loaded {file_path.name} from extraction cache")
+                    return doc
+                except Exception as e:
+                    logger.warning(f"Error reading extraction cache for {file_path.name}: {e}")
+
+            metadata = self.get_pdf_metadata(file_path)
+            content = "\n\n".join(
+                page_text for _page_num, page_text in self.iter_pages(file_path)
+            )
+
+            if not content.strip():
+                logger.warning(f"No text content extracted from {file_path.name}")
+                return None
+
+            doc_id = file_path.stem
+
+            logger.info(f"Successfully loaded {file_path.name}: {len(content)} characters, {metadata['num_pages']} pages")
+
+            doc = Document(
+                content=content,
+                metadata=metadata,
+                doc_id=doc_id
+            )
+
+            try:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(cache_file, 'wb') as file:
+                    pickle.dump(doc, file, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception as e:
+                logger.warning(f"Error writing extraction cache for {file_path.name}: {e}")
+
+            return doc
+
         except Exception as e:
             logger.error(f"Error loading PDF {file_path.name}: {e}")
             return None
@@ -74,39 +160,67 @@ class DocumentLoader:
         """Load all PDF documents from the documents directory"""
         documents = []
         pdf_files = list(self.documents_dir.glob("*.pdf"))
-        
+
         if not pdf_files:
             logger.warning(f"No PDF files found in {self.documents_dir}")
             return documents
-        
+
         logger.info(f"Found {len(pdf_files)} PDF files to process")
-        
-        for pdf_file in pdf_files:
-            doc = self.load_pdf(pdf_file)
+
+        if len(pdf_files) == 1:
+            doc = self.load_pdf(pdf_files[0])
             if doc:
                 documents.append(doc)
-        
+        else:
+            # Text extraction is CPU-bound pure Python - fan out across processes
+            max_workers = min(len(pdf_files), os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                for doc in executor.map(_extract_pdf, pdf_files, chunksize=1):
+                    if doc:
+                        documents.append(doc)
+
         logger.info(f"Successfully loaded {len(documents)} documents")
         return documents
     
     def get_document_info(self) -> List[Dict[str, Any]]:
         """Get information about all documents"""
-        pdf_files = list(self.documents_dir.glob("*.pdf"))
+        stats = [(pdf_file, pdf_file.stat()) for pdf_file in sorted(self.documents_dir.glob("*.pdf"))]
+
+        # Re-opening every PDF per call is wasteful; a stat-based fingerprint
+        # detects changes and otherwise serves the cached scan
+        fingerprint = tuple((pdf_file.name, stat.st_mtime_ns) for pdf_file, stat in stats)
+        if fingerprint == self._info_fingerprint:
+            return self._info_cache
+
         info = []
-        
-        for pdf_file in pdf_files:
-            try:
-                with open(pdf_file, 'rb') as file:
-                    pdf_reader = pypdf.PdfReader(file)
-                    info.append({
+
+        for pdf_file, stat in stats:
+            # Per-file cache: a directory change only reopens the files
+            # that actually changed
+            key = (str(pdf_file), stat.st_mtime_ns, stat.st_size)
+            entry = self._file_info_cache.get(key)
+
+            if entry is None:
+                try:
+                    entry = {
                         "filename": pdf_file.name,
-                        "num_pages": len(pdf_reader.pages),
-                        "size_bytes": pdf_file.stat().st_size,
-                    })
-            except Exception as e:
-                logger.error(f"Error getting info for {pdf_file.name}: {e}")
-        
+                        "num_pages": self.get_pdf_metadata(pdf_file)["num_pages"],
+                        "size_bytes": stat.st_size,
+                    }
+                    self._file_info_cache[key] = entry
+                except Exception as e:
+                    logger.error(f"Error getting info for {pdf_file.name}: {e}")
+                    continue
+
+            info.append(entry)
+
+        self._info_fingerprint = fingerprint
+        self._info_cache = info
         return info
 
+def _extract_pdf(file_path: Path) -> Optional[Document]:
+    """Module-level extraction entry point so worker processes can pickle it"""
+    return document_loader.load_pdf(file_path)
+
 # Global document loader instance
 document_loader = DocumentLoader()
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+Exact-match response cache with LRU and TTL eviction
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from config import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class SmartRAGCache:
+    """Thread-safe LRU+TTL cache over full pipeline query responses"""
+
+    def __init__(
+        self,
+        max_entries: int = 200,
+        ttl: int = settings.CACHE_TTL,
+        max_bytes: int = 100 * 1024 * 1024
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        logger.info(f"Response cache initialized: max_entries={max_entries}, ttl={ttl}s")
+
+    @staticmethod
+    def make_key(query: str, use_graph_expansion: bool) -> str:
+        """Build the cache key from the normalized query and options"""
+        raw = f"{query.strip().lower()}|{use_graph_expansion}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    @staticmethod
+    def _estimate_size(result: Dict[str, Any]) -> int:
+        """Rough per-entry byte estimate (response text dominates)"""
+        return len(result.get("response", "")) + 512
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for a key, honoring TTL"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            result, ts, size = entry
+            if time.time() - ts > self.ttl:
+                del self._entries[key]
+                self._total_bytes -= size
+                return None
+
+            self._entries.move_to_end(key)
+            return result
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """Store a result, evicting least-recently-used entries as needed"""
+        size = self._estimate_size(result)
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[2]
+
+            self._entries[key] = (result, time.time(), size)
+            self._total_bytes += size
+
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or self._total_bytes > self.max_bytes
+            ):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+
+    def clear(self):
+        """Drop all cached responses"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+        logger.info("Response cache cleared")
+
+# Global response cache instance
+response_cache = SmartRAGCache()
@@ -0,0 +1,104 @@
+"""
+Semantic cache for near-duplicate queries
+"""
+import threading
+import time
+import numpy as np
+from typing import Any, Dict, List, Optional
+from config import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class SemanticCache:
+    """In-memory response cache keyed on query-embedding similarity"""
+
+    def __init__(
+        self,
+        capacity: int = 512,
+        similarity_threshold: float = 0.95
+    ):
+        self.capacity = capacity
+        self.similarity_threshold = similarity_threshold
+        self._vecs: Optional[np.ndarray] = None
+        self._entries: List[Dict[str, Any]] = []
+        self._next_slot = 0
+        self._lock = threading.Lock()
+        logger.info(f"Semantic cache initialized: capacity={capacity}, threshold={similarity_threshold}")
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        """L2-normalize a query vector"""
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    @classmethod
+    def _quantize(cls, vector) -> np.ndarray:
+        """Quantize an L2-normalized vector to int8 (components fit [-1, 1])"""
+        normalized = cls._normalize(vector)
+        return np.clip(np.round(normalized * 127), -127, 127).astype(np.int8)
+
+    def get(self, query_vector) -> Optional[Dict[str, Any]]:
+        """Return the cached result for a semantically equivalent query, if any"""
+        query = self._quantize(query_vector)
+
+        # The int8 matmul over 512 rows is cheap enough to run under the
+        # lock, which keeps the sims/entries views consistent with put()
+        with self._lock:
+            if not self._entries:
+                return None
+
+            # int32 accumulation avoids overflow on the 768-term dot products
+            sims = (
+                self._vecs[:len(self._entries)].astype(np.int32) @ query.astype(np.int32)
+            ) / (127 * 127)
+            best = int(np.argmax(sims))
+
+            if sims[best] < self.similarity_threshold:
+                return None
+
+            entry = self._entries[best]
+            if time.time() - entry["ts"] > settings.CACHE_TTL:
+                return None
+
+            similarity = sims[best]
+            result = entry["result"]
+
+        logger.info(f"Semantic cache hit (similarity={similarity:.3f})")
+        return result
+
+    def put(self, query_vector, result: Dict[str, Any]):
+        """Store a query embedding and its result, evicting ring-buffer style"""
+        # int8 storage keeps the whole cache cache-line friendly (4x vs fp32)
+        query = self._quantize(query_vector)
+        entry = {"result": result, "ts": time.time()}
+
+        # put() is called concurrently from asyncio.to_thread workers; the
+        # slot claim, vector row and entry must be written as one unit or
+        # two queries can share a slot and pair one's embedding with the
+        # other's response
+        with self._lock:
+            if self._vecs is None:
+                self._vecs = np.zeros((self.capacity, query.shape[0]), dtype=np.int8)
+
+            slot = self._next_slot
+            self._vecs[slot] = query
+
+            if slot < len(self._entries):
+                self._entries[slot] = entry
+            else:
+                self._entries.append(entry)
+
+            self._next_slot = (slot + 1) % self.capacity
+
+    def clear(self):
+        """Drop all cached entries"""
+        with self._lock:
+            self._vecs = None
+            self._entries = []
+            self._next_slot = 0
+        logger.info("Semantic cache cleared")
+
+# Global semantic cache instance
+semantic_cache = SemanticCache()
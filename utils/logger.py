@@ -17,9 +17,10 @@ logger.add(
     level="DEBUG" if settings.DEBUG else "INFO"
 )
 
-# File handler
+# File handler; enqueue moves disk writes off the calling thread (and makes
+# the sinks safe for the multi-process document loader)
 log_path = settings.DATA_DIR / "logs"
-log_path.mkdir(exist_ok=True)
+log_path.mkdir(parents=True, exist_ok=True)
 
 logger.add(
     log_path / "sarthi_ai_{time:YYYY-MM-DD}.log",
@@ -27,7 +28,10 @@ logger.add(
     retention="30 days",
     compression="zip",
     format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function} | {message}",
-    level="DEBUG"
+    level="INFO",
+    enqueue=True,
+    backtrace=False,
+    diagnose=False
 )
 
 # Error file handler
@@ -37,7 +41,10 @@ logger.add(
     retention="90 days",
     compression="zip",
     level="ERROR",
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function} | {message}\n{extra}"
+    format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function} | {message}\n{extra}",
+    enqueue=True,
+    backtrace=False,
+    diagnose=False
 )
 
 def get_logger(name: str):